@@ -1,26 +1,39 @@
 """微博热搜自动推送主程序"""
+import atexit
 import os
+import queue
 import sys
 import logging
+from logging.handlers import QueueHandler, QueueListener
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from pathlib import Path
 from dotenv import load_dotenv
 
 # 添加 src 目录到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from weibo_fetcher import WeiboFetcher
-from weibo_summarizer import WeiboSummarizer
+from weibo_summarizer import get_summarizer
 from weibo_email_notifier import WeiboEmailNotifier
+from config import Config, ConfigError
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('weibo_trending.log'),
-        logging.StreamHandler()
-    ]
-)
+# 配置日志：主线程只负责入队，格式化与写文件由后台监听线程完成
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_log_handlers = [
+    logging.FileHandler('weibo_trending.log'),
+    logging.StreamHandler()
+]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+
+_log_queue = queue.Queue(-1)
+# QueueHandler 入队前会把格式化结果写入 record.msg，这里只保留消息本身，避免监听线程重复添加前缀
+logging.basicConfig(level=logging.INFO, format='%(message)s', handlers=[QueueHandler(_log_queue)])
+
+_log_listener = QueueListener(_log_queue, *_log_handlers)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 
 logger = logging.getLogger(__name__)
 
@@ -30,89 +43,80 @@ def main():
     try:
         logger.info("="*80)
         logger.info("微博热搜自动推送程序启动")
-        logger.info(f"执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        logger.info("执行时间: %s", datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
         logger.info("="*80)
         
         # 加载环境变量
         load_dotenv()
         
-        # 获取配置
-        tianapi_key = os.getenv("TIANAPI_KEY")
-        deepseek_api_key = os.getenv("DEEPSEEK_API_KEY")
-        deepseek_base_url = os.getenv("DEEPSEEK_BASE_URL")
-        email_sender = os.getenv("EMAIL_SENDER")
-        email_password = os.getenv("EMAIL_PASSWORD")
-        email_recipient = os.getenv("EMAIL_RECIPIENT")
-        smtp_server = os.getenv("SMTP_SERVER", "smtp.163.com")
-        smtp_port = int(os.getenv("SMTP_PORT", "465"))
-        
-        # 检查必要的配置
-        if not tianapi_key:
-            logger.error("TIANAPI_KEY 未设置")
-            return False
-        
-        if not deepseek_api_key:
-            logger.error("DEEPSEEK_API_KEY 未设置")
+        # 获取并校验配置
+        try:
+            config = Config.from_env()
+        except ConfigError as e:
+            logger.error("%s", e)
             return False
         
-        if not all([email_sender, email_password, email_recipient]):
-            logger.error("邮件配置不完整")
-            return False
+        # 提前创建总结器，DeepSeek 连接在抓取热搜期间于后台预热
+        summarizer = get_summarizer(config.deepseek_api_key, config.deepseek_base_url)
         
         # 步骤 1: 抓取微博热搜
         logger.info("\n[步骤 1/4] 抓取微博热搜...")
-        fetcher = WeiboFetcher(tianapi_key)
+        fetcher = WeiboFetcher(config.tianapi_key)
         topics = fetcher.fetch_hot_topics(limit=50)
         
         if not topics:
             logger.error("未能获取微博热搜数据")
             return False
         
-        logger.info(f"成功获取 {len(topics)} 个热搜话题")
+        logger.info("成功获取 %d 个热搜话题", len(topics))
         
         # 保存原始数据
-        with open('weibo_topics_raw.txt', 'w', encoding='utf-8') as f:
-            for i, topic in enumerate(topics, 1):
-                f.write(f"{i}. [{topic.get('hottag', '')}] {topic.get('hotword', '')} (热度: {topic.get('hotwordnum', '0')})\n")
+        # 榜单文本只生成一次，原始数据文件和总结附录共用
+        topics_text = fetcher.format_topics(topics)
+        Path('weibo_topics_raw.txt').write_text(topics_text + "\n", encoding='utf-8')
         logger.info("原始热搜数据已保存到 weibo_topics_raw.txt")
         
-        # 步骤 2: DeepSeek 总结
-        logger.info("\n[步骤 2/4] 使用 DeepSeek 生成总结...")
-        summarizer = WeiboSummarizer(deepseek_api_key, deepseek_base_url)
-        summary = summarizer.summarize(topics)
-        
-        if not summary:
-            logger.error("AI 总结失败")
-            return False
-        
-        logger.info(f"总结生成成功，长度: {len(summary)} 字符")
-        
-        # 保存总结
-        with open('weibo_summary.md', 'w', encoding='utf-8') as f:
-            f.write(f"# 微博热搜总结 - {datetime.now().strftime('%Y-%m-%d')}\n\n")
-            f.write(summary)
-            f.write("\n\n---\n\n")
-            f.write("## 完整热搜榜单\n\n")
-            f.write(fetcher.format_topics(topics))
-        logger.info("总结内容已保存到 weibo_summary.md")
-        
-        # 步骤 3: 发送邮件
-        logger.info("\n[步骤 3/4] 发送邮件通知...")
+        # 提前创建邮件通知器，SMTP 连接与 AI 总结并行建立
         notifier = WeiboEmailNotifier(
-            smtp_server=smtp_server,
-            smtp_port=smtp_port,
-            sender=email_sender,
-            password=email_password,
-            recipient=email_recipient
+            smtp_server=config.smtp_server,
+            smtp_port=config.smtp_port,
+            sender=config.email_sender,
+            password=config.email_password,
+            recipient=config.email_recipient
         )
         
-        email_sent = notifier.send_email(summary, topics)
+        with notifier, ThreadPoolExecutor(max_workers=1) as executor:
+            connect_future = executor.submit(notifier.connect)
+            
+            # 步骤 2: DeepSeek 总结
+            logger.info("\n[步骤 2/4] 使用 DeepSeek 生成总结...")
+            summary = summarizer.summarize(topics)
+            
+            if not summary:
+                logger.error("AI 总结失败")
+                return False
+            
+            logger.info("总结生成成功，长度: %d 字符", len(summary))
+            
+            # 保存总结
+            Path('weibo_summary.md').write_text(
+                f"# 微博热搜总结 - {datetime.now().strftime('%Y-%m-%d')}\n\n"
+                f"{summary}\n\n---\n\n"
+                f"## 完整热搜榜单\n\n{topics_text}",
+                encoding='utf-8'
+            )
+            logger.info("总结内容已保存到 weibo_summary.md")
+            
+            # 步骤 3: 发送邮件
+            logger.info("\n[步骤 3/4] 发送邮件通知...")
+            connect_future.result()
+            email_sent = notifier.send_email(summary, topics)
         
         if email_sent:
             logger.info("="*80)
             logger.info("✅ 邮件发送成功！")
-            logger.info(f"收件人: {email_recipient}")
-            logger.info(f"热搜数量: {len(topics)}")
+            logger.info("收件人: %s", config.email_recipient)
+            logger.info("热搜数量: %d", len(topics))
             logger.info("="*80)
             return True
         else:
@@ -120,7 +124,7 @@ def main():
             return False
             
     except Exception as e:
-        logger.error(f"程序执行失败: {str(e)}", exc_info=True)
+        logger.error("程序执行失败: %s", e, exc_info=True)
         return False
 
 
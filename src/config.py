@@ -0,0 +1,62 @@
+"""运行配置模块"""
+import functools
+import os
+from dataclasses import dataclass, field
+
+
+class ConfigError(ValueError):
+    """配置缺失或无效"""
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """微博热搜推送运行配置"""
+    
+    tianapi_key: str = field(repr=False)
+    deepseek_api_key: str = field(repr=False)
+    deepseek_base_url: str
+    email_sender: str
+    email_password: str = field(repr=False)
+    email_recipient: str
+    smtp_server: str
+    smtp_port: int
+    
+    @classmethod
+    @functools.lru_cache(maxsize=1)
+    def from_env(cls) -> "Config":
+        """
+        从环境变量读取并校验配置，每个变量只读取一次
+        
+        Returns:
+            配置对象
+        
+        Raises:
+            ConfigError: 缺少必要配置或配置无效时抛出，列出所有问题
+        """
+        env = os.environ
+        required = {
+            "TIANAPI_KEY": env.get("TIANAPI_KEY"),
+            "DEEPSEEK_API_KEY": env.get("DEEPSEEK_API_KEY"),
+            "EMAIL_SENDER": env.get("EMAIL_SENDER"),
+            "EMAIL_PASSWORD": env.get("EMAIL_PASSWORD"),
+            "EMAIL_RECIPIENT": env.get("EMAIL_RECIPIENT"),
+        }
+        errors = [f"{name} 未设置" for name, value in required.items() if not value]
+        
+        smtp_port = env.get("SMTP_PORT", "465").strip()
+        if not smtp_port.isdecimal():
+            errors.append(f"SMTP_PORT 无效: {smtp_port}")
+        
+        if errors:
+            raise ConfigError("配置不完整: " + "; ".join(errors))
+        
+        return cls(
+            tianapi_key=required["TIANAPI_KEY"],
+            deepseek_api_key=required["DEEPSEEK_API_KEY"],
+            deepseek_base_url=env.get("DEEPSEEK_BASE_URL") or "https://api.deepseek.com",
+            email_sender=required["EMAIL_SENDER"],
+            email_password=required["EMAIL_PASSWORD"],
+            email_recipient=required["EMAIL_RECIPIENT"],
+            smtp_server=env.get("SMTP_SERVER", "smtp.163.com"),
+            smtp_port=int(smtp_port),
+        )
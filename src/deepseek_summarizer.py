@@ -1,4 +1,6 @@
 """DeepSeek API总结模块"""
+import atexit
+import importlib.util
 import logging
 import os
 import time
@@ -8,12 +10,54 @@ logger = logging.getLogger(__name__)
 
 # 尝试导入 openai 库（DeepSeek 使用 OpenAI 兼容接口）
 try:
+    import httpx
     from openai import OpenAI
     OPENAI_AVAILABLE = True
 except ImportError:
     OPENAI_AVAILABLE = False
     logger.warning("openai 库未安装，DeepSeek 功能将不可用。请运行: pip install openai")
 
+# 进程内共享的 HTTP 客户端，多个总结器实例复用同一连接池
+_http_client = None
+
+
+def _get_http_client():
+    """
+    获取共享的 httpx 客户端，首次调用时创建
+    
+    Returns:
+        httpx.Client 实例，安装了 h2 时启用 HTTP/2
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(
+            http2=importlib.util.find_spec("h2") is not None,
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=300)
+        )
+        atexit.register(_http_client.close)
+    return _http_client
+
+
+# Reddit新闻总结系统提示词
+# 每次调用保持完全一致，使 DeepSeek 服务端的前缀缓存（prompt cache）能够命中
+SYSTEM_PROMPT = """你是新闻总结助手，请对用户提供的Reddit热门新闻帖子进行总结，要求：
+
+1. 生成结构化的Markdown格式总结
+2. 包含以下部分：
+   - **今日热点概览**：简要概述今天的主要新闻话题
+   - **重点新闻**：列出3-5个最重要的新闻（使用列表格式，包含标题和简要说明）
+   - **热门讨论**：提取评分最高或讨论最热烈的话题
+   - **总结**：一句话总结今日新闻的主要趋势
+
+3. 使用中文输出
+4. 保持客观、准确
+5. 如果内容较长，可以适当精简但不要遗漏关键信息
+6. 对于英文内容，请理解后用中文总结"""
+
+# 用户提示词模板，可变内容放在最后
+USER_PROMPT_TEMPLATE = "Reddit热门帖子内容：\n{content}"
+
 
 class DeepSeekSummarizer:
     """DeepSeek总结器"""
@@ -39,7 +83,8 @@ class DeepSeekSummarizer:
         # 使用 OpenAI 兼容接口创建客户端
         self.client = OpenAI(
             api_key=self.api_key,
-            base_url=self.base_url
+            base_url=self.base_url,
+            http_client=_get_http_client()
         )
         
         # 使用的模型名称
@@ -48,26 +93,6 @@ class DeepSeekSummarizer:
         # 重试配置
         self.max_retries = 3
         self.retry_delay = 2  # 秒
-        
-        # Reddit新闻总结提示词模板
-        self.summary_prompt_template = """请对以下Reddit热门新闻帖子进行总结，要求：
-
-1. 生成结构化的Markdown格式总结
-2. 包含以下部分：
-   - **今日热点概览**：简要概述今天的主要新闻话题
-   - **重点新闻**：列出3-5个最重要的新闻（使用列表格式，包含标题和简要说明）
-   - **热门讨论**：提取评分最高或讨论最热烈的话题
-   - **总结**：一句话总结今日新闻的主要趋势
-
-3. 使用中文输出
-4. 保持客观、准确
-5. 如果内容较长，可以适当精简但不要遗漏关键信息
-6. 对于英文内容，请理解后用中文总结
-
-Reddit热门帖子内容：
-{content}
-
-请开始总结："""
     
     def summarize(self, content: str, context: str = "") -> Optional[str]:
         """
@@ -84,50 +109,49 @@ Reddit热门帖子内容：
             logger.warning("内容为空，无法总结")
             return None
         
-        logger.info(f"开始总结内容，长度: {len(content)} 字符")
+        logger.info("开始总结内容，长度: %d 字符", len(content))
         
-        # 构建提示词
-        prompt = self.summary_prompt_template.format(content=content)
+        # 构建提示词：固定的系统提示词在前，可变内容在后
+        user_prompt = USER_PROMPT_TEMPLATE.format(content=content)
         
-        # 如果有额外上下文，添加到提示词中
+        # 如果有额外上下文，添加到用户提示词中
         if context:
-            prompt = f"上下文：{context}\n\n" + prompt
+            user_prompt = f"上下文：{context}\n\n" + user_prompt
+        
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
         
         # 重试机制
         last_error = None
         for attempt in range(self.max_retries):
             try:
-                # 使用 OpenAI 兼容接口调用 DeepSeek API
-                response = self.client.chat.completions.create(
+                # 使用 OpenAI 兼容接口调用 DeepSeek API（流式返回）
+                stream = self.client.chat.completions.create(
                     model=self.model_name,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": prompt
-                        }
-                    ],
+                    messages=messages,
                     temperature=0.7,
-                    max_tokens=2000
+                    max_tokens=2000,
+                    stream=True,
+                    stream_options={"include_usage": True}
                 )
                 
-                # 检查响应
-                if not response:
-                    logger.error("DeepSeek API返回空响应对象")
+                # 逐块累积响应文本
+                try:
+                    summary_text, usage = self._collect_stream(stream)
+                except (AttributeError, IndexError, TypeError) as e:
+                    last_error = e
+                    logger.error("无法从响应中提取文本内容: %s", e)
                     continue
                 
-                # 获取响应文本
-                if hasattr(response, 'choices') and response.choices:
-                    choice = response.choices[0]
-                    if hasattr(choice, 'message') and hasattr(choice.message, 'content'):
-                        summary_text = choice.message.content
-                    elif hasattr(choice, 'text'):
-                        summary_text = choice.text
-                    else:
-                        logger.error("无法从响应中提取文本内容")
-                        continue
-                else:
-                    logger.error("响应中没有 choices")
-                    continue
+                if usage is not None:
+                    logger.info(
+                        "Token 用量: 输入 %s（缓存命中 %s），输出 %s",
+                        usage.prompt_tokens,
+                        getattr(usage, 'prompt_cache_hit_tokens', 0),
+                        usage.completion_tokens
+                    )
                 
                 if not summary_text:
                     logger.warning("总结内容为空")
@@ -139,7 +163,7 @@ Reddit热门帖子内容：
                     logger.warning("总结内容为空（去除空白后）")
                     continue
                 
-                logger.info(f"总结完成，长度: {len(summary)} 字符")
+                logger.info("总结完成，长度: %d 字符", len(summary))
                 return summary
                 
             except Exception as e:
@@ -147,29 +171,65 @@ Reddit热门帖子内容：
                 error_msg = str(e)
                 
                 # 记录详细错误信息
-                logger.warning(f"第 {attempt + 1} 次尝试失败: {error_msg}")
+                logger.warning("第 %d 次尝试失败: %s", attempt + 1, error_msg)
                 
-                # 检查是否是配额错误（429）
-                if "429" in error_msg or "rate limit" in error_msg.lower() or "quota" in error_msg.lower():
-                    wait_time = self.retry_delay * (attempt + 1) * 2
-                    logger.info(f"遇到配额限制，等待 {wait_time} 秒后重试...")
-                    time.sleep(wait_time)
-                # 检查是否是临时错误（500, 503）
-                elif "500" in error_msg or "503" in error_msg or "service unavailable" in error_msg.lower():
-                    wait_time = self.retry_delay * (attempt + 1)
-                    logger.info(f"遇到服务器错误，等待 {wait_time} 秒后重试...")
-                    time.sleep(wait_time)
-                # 其他错误通常不应该重试
-                elif "400" in error_msg or "401" in error_msg or "403" in error_msg or "404" in error_msg:
-                    logger.error(f"请求错误，不重试: {error_msg}")
+                wait_time = self._retry_wait(attempt, error_msg)
+                if wait_time is None:
+                    logger.error("请求错误，不重试: %s", error_msg)
                     return None
-                # 网络错误可以重试
-                else:
-                    if attempt < self.max_retries - 1:
-                        wait_time = self.retry_delay * (attempt + 1)
-                        logger.info(f"等待 {wait_time} 秒后重试...")
-                        time.sleep(wait_time)
+                
+                if attempt < self.max_retries - 1:
+                    logger.info("等待 %s 秒后重试...", wait_time)
+                    time.sleep(wait_time)
         
         # 所有重试都失败
-        logger.error(f"总结内容失败，已重试 {self.max_retries} 次。最后错误: {last_error}")
+        logger.error("总结内容失败，已重试 %d 次。最后错误: %s", self.max_retries, last_error)
         return None
+    
+    @staticmethod
+    def _collect_stream(stream):
+        """
+        从流式响应中累积文本和用量信息
+        
+        Args:
+            stream: chat.completions 流式响应
+            
+        Returns:
+            (完整文本, 用量信息) 元组，用量信息可能为None
+        """
+        parts = []
+        usage = None
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if chunk.choices:
+                parts.append(chunk.choices[0].delta.content or "")
+        return "".join(parts), usage
+    
+    def _retry_wait(self, attempt: int, error_msg: str) -> Optional[float]:
+        """
+        根据错误信息计算重试前的等待时间
+        
+        Args:
+            attempt: 当前尝试序号（从0开始）
+            error_msg: 错误信息
+            
+        Returns:
+            等待秒数，不应重试时返回None
+        """
+        lowered = error_msg.lower()
+        
+        # 配额错误（429）加倍退避
+        if "429" in error_msg or "rate limit" in lowered or "quota" in lowered:
+            return self.retry_delay * (attempt + 1) * 2
+        
+        # 临时错误（500, 503）按线性退避
+        if "500" in error_msg or "503" in error_msg or "service unavailable" in lowered:
+            return self.retry_delay * (attempt + 1)
+        
+        # 客户端错误通常不应该重试
+        if "400" in error_msg or "401" in error_msg or "403" in error_msg or "404" in error_msg:
+            return None
+        
+        # 网络错误可以重试
+        return self.retry_delay * (attempt + 1)
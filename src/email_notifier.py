@@ -1,16 +1,19 @@
 """SMTP邮件发送模块"""
 import logging
 import os
+import re
 import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.header import Header
+from email.message import EmailMessage
+from email.policy import SMTP
 from typing import List, Dict, Optional
 from datetime import datetime
 import markdown
 
 logger = logging.getLogger(__name__)
 
+# 匹配 Markdown 代码块起始行
+_HAS_FENCE = re.compile(r'^\s*(```|~~~)', re.M)
+
 
 class EmailNotifier:
     """邮件通知器"""
@@ -54,13 +57,13 @@ class EmailNotifier:
         if self.smtp_port == 465:
             self.use_ssl = True
             self.use_tls = False
-            logger.debug(f"端口465，自动使用SSL")
+            logger.debug("端口465，自动使用SSL")
         elif self.smtp_port == 587:
             self.use_tls = use_tls if use_tls is not None else (
                 os.getenv("SMTP_USE_TLS", "true").lower() == "true"
             )
             self.use_ssl = False
-            logger.debug(f"端口587，使用TLS: {self.use_tls}")
+            logger.debug("端口587，使用TLS: %s", self.use_tls)
         else:
             self.use_tls = use_tls if use_tls is not None else (
                 os.getenv("SMTP_USE_TLS", "true").lower() == "true"
@@ -68,7 +71,7 @@ class EmailNotifier:
             self.use_ssl = use_ssl if use_ssl is not None else (
                 os.getenv("SMTP_USE_SSL", "false").lower() == "true"
             )
-            logger.debug(f"端口{self.smtp_port}，使用TLS: {self.use_tls}, SSL: {self.use_ssl}")
+            logger.debug("端口%s，使用TLS: %s, SSL: %s", self.smtp_port, self.use_tls, self.use_ssl)
         
         # 验证必要参数
         if not all([self.smtp_host, self.smtp_port, self.smtp_user,
@@ -77,9 +80,15 @@ class EmailNotifier:
         
         if not self.smtp_to_list:
             raise ValueError("收件人邮箱未设置")
+        
+        # Markdown 转换器只构建一次，避免每次转换重复注册扩展
+        # 不含代码块的文本使用不带 codehilite 的转换器，跳过 Pygments 初始化
+        self._md_fast = markdown.Markdown(extensions=['extra', 'nl2br'])
+        self._md_full = markdown.Markdown(extensions=['extra', 'codehilite', 'nl2br'])
     
     def _create_email(self, subject: str, html_content: str,
-                     text_content: Optional[str] = None) -> MIMEMultipart:
+                     text_content: Optional[str] = None,
+                     cte: Optional[str] = None) -> EmailMessage:
         """
         创建邮件消息
         
@@ -87,23 +96,22 @@ class EmailNotifier:
             subject: 邮件主题
             html_content: HTML内容
             text_content: 纯文本内容（可选）
+            cte: 正文传输编码，为None时按内容自动选择（可能为8bit）
             
         Returns:
-            MIMEMultipart邮件对象
+            EmailMessage邮件对象
         """
-        msg = MIMEMultipart('alternative')
-        msg['From'] = Header(self.smtp_from, 'utf-8')
-        msg['To'] = Header(','.join(self.smtp_to_list), 'utf-8')
-        msg['Subject'] = Header(subject, 'utf-8')
+        msg = EmailMessage(policy=SMTP)
+        msg['From'] = self.smtp_from
+        msg['To'] = ','.join(self.smtp_to_list)
+        msg['Subject'] = subject
         
-        # 添加纯文本版本（如果有）
+        # 添加纯文本版本（如果有），HTML作为其替代版本
         if text_content:
-            text_part = MIMEText(text_content, 'plain', 'utf-8')
-            msg.attach(text_part)
-        
-        # 添加HTML版本
-        html_part = MIMEText(html_content, 'html', 'utf-8')
-        msg.attach(html_part)
+            msg.set_content(text_content, cte=cte)
+            msg.add_alternative(html_content, subtype='html', cte=cte)
+        else:
+            msg.set_content(html_content, subtype='html', cte=cte)
         
         return msg
     
@@ -117,11 +125,8 @@ class EmailNotifier:
         Returns:
             HTML文本
         """
-        html = markdown.markdown(
-            markdown_text,
-            extensions=['extra', 'codehilite', 'nl2br']
-        )
-        return html
+        md = self._md_full if _HAS_FENCE.search(markdown_text) else self._md_fast
+        return md.reset().convert(markdown_text)
     
     def _create_reddit_email_html(self, summary: str, posts: List[Dict]) -> str:
         """
@@ -238,34 +243,41 @@ class EmailNotifier:
             text_content += f"   链接：{post.get('permalink', '#')}\n"
             text_content += f"   评分：{post.get('score', 0)} | 评论：{post.get('num_comments', 0)}\n\n"
         
-        # 创建邮件消息
-        msg = self._create_email(subject, html_content, text_content)
-        
         # 发送邮件（带重试）
         for attempt in range(max_retries):
             try:
-                logger.info(f"尝试发送邮件（第 {attempt + 1} 次）")
+                logger.info("尝试发送邮件（第 %d 次）", attempt + 1)
                 
                 if self.use_ssl:
                     server = smtplib.SMTP_SSL(self.smtp_host, self.smtp_port, timeout=30)
-                    logger.debug(f"使用SSL连接到 {self.smtp_host}:{self.smtp_port}")
+                    logger.debug("使用SSL连接到 %s:%s", self.smtp_host, self.smtp_port)
                 else:
                     server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=30)
-                    logger.debug(f"使用SMTP连接到 {self.smtp_host}:{self.smtp_port}")
+                    logger.debug("使用SMTP连接到 %s:%s", self.smtp_host, self.smtp_port)
                 
                 if self.use_tls and not self.use_ssl:
                     server.starttls()
                     logger.debug("已启动TLS加密")
                 
                 server.login(self.smtp_user, self.smtp_password)
-                server.sendmail(self.smtp_from, self.smtp_to_list, msg.as_string())
+                
+                # 服务器支持 8BITMIME 时按内容自动选择编码（可能为 8bit），否则强制使用 quoted-printable
+                eight_bit = server.has_extn('8bitmime')
+                msg = self._create_email(
+                    subject, html_content, text_content,
+                    cte=None if eight_bit else 'quoted-printable'
+                )
+                server.send_message(
+                    msg, from_addr=self.smtp_from, to_addrs=self.smtp_to_list,
+                    mail_options=['BODY=8BITMIME'] if eight_bit else []
+                )
                 server.quit()
                 
-                logger.info(f"邮件发送成功：{subject}")
+                logger.info("邮件发送成功：%s", subject)
                 return True
                 
             except Exception as e:
-                logger.error(f"发送邮件失败（第 {attempt + 1} 次）: {e}")
+                logger.error("发送邮件失败（第 %d 次）: %s", attempt + 1, e)
                 if attempt < max_retries - 1:
                     logger.info("等待重试...")
                 else:
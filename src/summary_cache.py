@@ -0,0 +1,82 @@
+"""总结结果磁盘缓存模块"""
+import logging
+import os
+import tempfile
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SummaryCache:
+    """以热搜内容哈希为键的总结磁盘缓存，可作为 WeiboSummarizer 的持久化缓存"""
+    
+    def __init__(self, cache_dir: str = ".summary_cache", ttl: int = 6 * 3600, maxsize: int = 64):
+        """
+        初始化总结缓存
+        
+        Args:
+            cache_dir: 缓存目录
+            ttl: 缓存有效期（秒），默认 6 小时
+            maxsize: 最多保留的缓存文件数
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.maxsize = maxsize
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.md")
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        读取缓存的总结
+        
+        Args:
+            key: 缓存键
+        
+        Returns:
+            缓存的总结，不存在或已过期时返回 None
+        """
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def set(self, key: str, summary: str):
+        """
+        写入总结缓存（原子写入），并按修改时间淘汰旧缓存；缓存目录在首次写入时创建
+        
+        Args:
+            key: 缓存键
+            summary: 总结内容
+        """
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(summary)
+            os.replace(tmp_path, self._path(key))
+            self._evict()
+        except OSError as e:
+            logger.warning("写入总结缓存失败: %s", e)
+    
+    def _evict(self):
+        """超出容量时删除最旧的缓存文件"""
+        entries = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.endswith(".md")
+        ]
+        if len(entries) <= self.maxsize:
+            return
+        
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:len(entries) - self.maxsize]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
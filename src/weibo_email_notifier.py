@@ -1,13 +1,120 @@
 """微博热搜邮件通知模块"""
+import re
 import smtplib
 import logging
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from email.message import EmailMessage
+from email.policy import SMTP
 from datetime import datetime
+from html import escape
 from typing import List, Dict
+from urllib.parse import quote
+
+from weibo_fetcher import format_heat
 
 logger = logging.getLogger(__name__)
 
+# 邮件样式，统一放在 <style> 中，避免每行重复内联样式
+_EMAIL_CSS = """
+body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; max-width: 800px; margin: 0 auto; padding: 20px; background-color: #f5f5f5; }
+.card { background-color: white; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); overflow: hidden; }
+.header { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; text-align: center; }
+.header h1 { color: white; margin: 0; font-size: 28px; }
+.header p { color: rgba(255,255,255,0.9); margin: 10px 0 0 0; font-size: 14px; }
+.section { padding: 30px; }
+.section h2 { color: #333; margin-top: 0; font-size: 20px; display: flex; align-items: center; }
+.section h2 span { margin-right: 10px; }
+.summary-section { background-color: #f8f9fa; border-bottom: 3px solid #667eea; }
+.summary-section h2 { color: #667eea; }
+.summary { background-color: white; padding: 20px; border-radius: 8px; border-left: 4px solid #667eea; line-height: 1.8; white-space: pre-wrap; }
+table { width: 100%; border-collapse: collapse; background-color: white; border-radius: 8px; overflow: hidden; }
+.r { border-bottom: 1px solid #eee; }
+.n { padding: 12px 8px; text-align: center; color: #999; width: 40px; }
+.w { padding: 12px 8px; }
+.w a { color: #333; text-decoration: none; font-size: 14px; }
+.h { padding: 12px 8px; text-align: right; color: #ff6b6b; font-weight: bold; width: 100px; }
+.tag { color: white; padding: 2px 6px; border-radius: 3px; font-size: 12px; margin-right: 8px; }
+.tag-hot { background-color: #ff6b6b; }
+.tag-new { background-color: #4ecdc4; }
+.tag-default { background-color: #95e1d3; }
+.footer { padding: 20px; text-align: center; background-color: #f8f9fa; border-top: 1px solid #eee; }
+.footer p { color: #999; font-size: 12px; margin: 0; }
+.footer p + p { margin-top: 5px; }
+"""
+
+# 热搜标签对应的样式类
+_TAG_CLASS = {"热": "tag-hot", "新": "tag-new"}
+_DEFAULT_TAG_CLASS = "tag-default"
+
+# 常见标签的 <span> 预先生成，每行只需一次字典查找
+_TAG_HTML = {tag: f'<span class="tag {cls}">{tag}</span>' for tag, cls in _TAG_CLASS.items()}
+
+# 热搜榜单单行模板
+_ROW_TEMPLATE = '<tr class="r"><td class="n">{i}</td><td class="w">{tag_html}<a href="{weibo_url}">{hotword}</a></td><td class="h">{heat_str}</td></tr>'
+
+# 邮件整体 HTML 模板
+_HTML_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <style>{style}</style>
+</head>
+<body>
+    <div class="card">
+        <!-- Header -->
+        <div class="header">
+            <h1>📱 微博热搜榜</h1>
+            <p>{date}</p>
+        </div>
+        
+        <!-- AI Summary -->
+        <div class="section summary-section">
+            <h2><span>🤖</span> AI 智能总结</h2>
+            <div class="summary">{summary}</div>
+        </div>
+        
+        <!-- Hot Topics List -->
+        <div class="section">
+            <h2><span>🔥</span> 热搜榜单（Top 30）</h2>
+            <table>
+                {topics_html}
+            </table>
+        </div>
+        
+        <!-- Footer -->
+        <div class="footer">
+            <p>数据来源：微博热搜榜 | 由 AI 自动生成</p>
+            <p>更新时间：{now}</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+# 模板在导入时去除注释与缩进，减小邮件体积（保留换行，避免超出 SMTP 单行长度限制）
+_EMAIL_CSS = _EMAIL_CSS.strip()
+_HTML_TEMPLATE = re.sub(r'\n\s+', '\n', re.sub(r'\s*<!--.*?-->', '', _HTML_TEMPLATE))
+
+# SMTP 协议单行最大字节数（不含 CRLF）
+_SMTP_MAX_LINE = 998
+
+
+def _fits_8bit(*contents: str) -> bool:
+    """
+    判断内容能否以 8bit 编码传输（每行不超过 SMTP 单行长度限制）
+    
+    Args:
+        contents: 待发送的正文
+    
+    Returns:
+        是否所有行都在限制之内
+    """
+    return all(
+        len(line.encode('utf-8')) <= _SMTP_MAX_LINE
+        for content in contents
+        for line in content.splitlines()
+    )
+
 
 class WeiboEmailNotifier:
     """微博热搜邮件通知器"""
@@ -28,8 +135,60 @@ class WeiboEmailNotifier:
         self.sender = sender
         self.password = password
         self.recipient = recipient
+        self._server = None
         logger.info("微博热搜邮件通知器初始化成功")
     
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def _get_server(self) -> smtplib.SMTP_SSL:
+        """
+        获取已登录的 SMTP 连接，连接失效时自动重连
+        
+        Returns:
+            已登录的 SMTP_SSL 连接
+        """
+        if self._server is not None:
+            try:
+                if self._server.noop()[0] == 250:
+                    return self._server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.close()
+        
+        server = smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=30)
+        server.login(self.sender, self.password)
+        self._server = server
+        return server
+    
+    def connect(self) -> bool:
+        """
+        预先建立 SMTP 连接，可与生成总结并行执行以隐藏握手耗时
+        
+        Returns:
+            是否连接成功
+        """
+        try:
+            self._get_server()
+            logger.info("SMTP 连接已建立")
+            return True
+        except Exception as e:
+            logger.warning("SMTP 预连接失败，将在发送时重试: %s", e)
+            return False
+    
+    def close(self):
+        """关闭 SMTP 连接"""
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        self._server = None
+    
     def send_email(self, summary: str, topics: List[Dict]) -> bool:
         """
         发送微博热搜邮件
@@ -42,42 +201,82 @@ class WeiboEmailNotifier:
             是否发送成功
         """
         try:
-            # 创建邮件
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = f"微博热搜榜 - {datetime.now().strftime('%Y-%m-%d')}"
-            msg['From'] = self.sender
-            msg['To'] = self.recipient
-            
-            # 生成 HTML 内容
+            subject = f"微博热搜榜 - {datetime.now().strftime('%Y-%m-%d')}"
+            text_content = self._generate_text(summary, topics)
             html_content = self._generate_html(summary, topics)
             
-            # 添加 HTML 部分
-            html_part = MIMEText(html_content, 'html', 'utf-8')
-            msg.attach(html_part)
-            
             # 发送邮件（最多重试 3 次）
             for attempt in range(3):
                 try:
-                    logger.info(f"尝试发送邮件（第 {attempt + 1} 次）")
+                    logger.info("尝试发送邮件（第 %d 次）", attempt + 1)
                     
-                    with smtplib.SMTP_SSL(self.smtp_server, self.smtp_port, timeout=30) as server:
-                        server.login(self.sender, self.password)
-                        server.send_message(msg)
+                    server = self._get_server()
                     
-                    logger.info(f"邮件发送成功：{msg['Subject']}")
+                    # 服务器支持 8BITMIME 且无超长行时正文直接以 UTF-8 原文传输，否则使用 quoted-printable
+                    eight_bit = server.has_extn('8bitmime') and _fits_8bit(text_content, html_content)
+                    msg = self._create_message(
+                        subject, text_content, html_content,
+                        cte='8bit' if eight_bit else 'quoted-printable'
+                    )
+                    server.send_message(msg, mail_options=['BODY=8BITMIME'] if eight_bit else [])
+                    
+                    logger.info("邮件发送成功：%s", subject)
                     return True
                     
                 except smtplib.SMTPException as e:
-                    logger.warning(f"第 {attempt + 1} 次发送失败: {str(e)}")
+                    logger.warning("第 %d 次发送失败: %s", attempt + 1, e)
+                    # 丢弃可能已损坏的连接，下次重试时重新建立
+                    self.close()
                     if attempt == 2:
                         raise
             
             return False
             
         except Exception as e:
-            logger.error(f"邮件发送失败: {str(e)}")
+            logger.error("邮件发送失败: %s", e)
             return False
     
+    def _create_message(self, subject: str, text_content: str, html_content: str, cte: str) -> EmailMessage:
+        """
+        创建邮件消息
+        
+        Args:
+            subject: 邮件主题
+            text_content: 纯文本内容
+            html_content: HTML 内容
+            cte: 正文传输编码（8bit 或 quoted-printable）
+        
+        Returns:
+            邮件对象
+        """
+        msg = EmailMessage(policy=SMTP)
+        msg['Subject'] = subject
+        msg['From'] = self.sender
+        msg['To'] = self.recipient
+        
+        # 纯文本版本在前，HTML 版本在后
+        msg.set_content(text_content, cte=cte)
+        msg.add_alternative(html_content, subtype='html', cte=cte)
+        return msg
+    
+    def _generate_text(self, summary: str, topics: List[Dict]) -> str:
+        """
+        生成纯文本邮件内容
+        
+        Args:
+            summary: AI 总结
+            topics: 热搜列表
+        
+        Returns:
+            纯文本内容
+        """
+        lines = ["AI 智能总结", "", summary, "", "热搜榜单（Top 30）", ""]
+        for i, topic in enumerate(topics[:30], 1):
+            heat_str = topic.get("heat_str") or format_heat(topic.get("hotwordnum", "0"))
+            lines.append(f"{i}. {topic.get('hotword', '')} (热度: {heat_str})")
+        
+        return "\n".join(lines)
+    
     def _generate_html(self, summary: str, topics: List[Dict]) -> str:
         """
         生成 HTML 邮件内容
@@ -90,86 +289,36 @@ class WeiboEmailNotifier:
             HTML 内容
         """
         # 生成热搜列表 HTML
-        topics_html = ""
+        rows = []
         for i, topic in enumerate(topics[:30], 1):  # 只显示前 30 个
-            hottag = topic.get("hottag", "")
+            hottag = escape(topic.get("hottag", ""))
             hotword = topic.get("hotword", "")
-            hotwordnum = topic.get("hotwordnum", "0")
-            
-            # 格式化热度
-            try:
-                heat = int(hotwordnum)
-                if heat >= 10000:
-                    heat_str = f"{heat/10000:.1f}万"
-                else:
-                    heat_str = str(heat)
-            except:
-                heat_str = hotwordnum
+            heat_str = topic.get("heat_str") or format_heat(topic.get("hotwordnum", "0"))
             
-            # 标签颜色
-            tag_color = "#ff6b6b" if hottag == "热" else "#4ecdc4" if hottag == "新" else "#95e1d3"
-            tag_html = f'<span style="background-color: {tag_color}; color: white; padding: 2px 6px; border-radius: 3px; font-size: 12px; margin-right: 8px;">{hottag}</span>' if hottag else ""
+            # 标签样式
+            tag_html = _TAG_HTML.get(hottag)
+            if tag_html is None:
+                tag_html = f'<span class="tag {_DEFAULT_TAG_CLASS}">{hottag}</span>' if hottag else ""
             
             # 微博链接
-            weibo_url = f"https://s.weibo.com/weibo?q={hotword}"
+            weibo_url = f"https://s.weibo.com/weibo?q={quote(hotword)}"
             
-            topics_html += f"""
-            <tr style="border-bottom: 1px solid #eee;">
-                <td style="padding: 12px 8px; text-align: center; color: #999; width: 40px;">{i}</td>
-                <td style="padding: 12px 8px;">
-                    {tag_html}
-                    <a href="{weibo_url}" style="color: #333; text-decoration: none; font-size: 14px;">{hotword}</a>
-                </td>
-                <td style="padding: 12px 8px; text-align: right; color: #ff6b6b; font-weight: bold; width: 100px;">{heat_str}</td>
-            </tr>
-            """
+            rows.append(_ROW_TEMPLATE.format(
+                i=i,
+                tag_html=tag_html,
+                weibo_url=weibo_url,
+                hotword=escape(hotword),
+                heat_str=escape(heat_str)
+            ))
         
-        # 完整 HTML
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        </head>
-        <body style="font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; max-width: 800px; margin: 0 auto; padding: 20px; background-color: #f5f5f5;">
-            <div style="background-color: white; border-radius: 10px; box-shadow: 0 2px 10px rgba(0,0,0,0.1); overflow: hidden;">
-                <!-- Header -->
-                <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; text-align: center;">
-                    <h1 style="color: white; margin: 0; font-size: 28px;">📱 微博热搜榜</h1>
-                    <p style="color: rgba(255,255,255,0.9); margin: 10px 0 0 0; font-size: 14px;">{datetime.now().strftime('%Y年%m月%d日')}</p>
-                </div>
-                
-                <!-- AI Summary -->
-                <div style="padding: 30px; background-color: #f8f9fa; border-bottom: 3px solid #667eea;">
-                    <h2 style="color: #667eea; margin-top: 0; font-size: 20px; display: flex; align-items: center;">
-                        <span style="margin-right: 10px;">🤖</span> AI 智能总结
-                    </h2>
-                    <div style="background-color: white; padding: 20px; border-radius: 8px; border-left: 4px solid #667eea; line-height: 1.8; white-space: pre-wrap;">{summary}</div>
-                </div>
-                
-                <!-- Hot Topics List -->
-                <div style="padding: 30px;">
-                    <h2 style="color: #333; margin-top: 0; font-size: 20px; display: flex; align-items: center;">
-                        <span style="margin-right: 10px;">🔥</span> 热搜榜单（Top 30）
-                    </h2>
-                    <table style="width: 100%; border-collapse: collapse; background-color: white; border-radius: 8px; overflow: hidden;">
-                        {topics_html}
-                    </table>
-                </div>
-                
-                <!-- Footer -->
-                <div style="padding: 20px; text-align: center; background-color: #f8f9fa; border-top: 1px solid #eee;">
-                    <p style="color: #999; font-size: 12px; margin: 0;">
-                        数据来源：微博热搜榜 | 由 AI 自动生成
-                    </p>
-                    <p style="color: #999; font-size: 12px; margin: 5px 0 0 0;">
-                        更新时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-                    </p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        topics_html = "\n".join(rows)
         
-        return html
+        # 完整 HTML
+        now = datetime.now()
+        return _HTML_TEMPLATE.format(
+            style=_EMAIL_CSS,
+            date=now.strftime('%Y年%m月%d日'),
+            summary=escape(summary),
+            topics_html=topics_html,
+            now=now.strftime('%Y-%m-%d %H:%M:%S')
+        )
@@ -2,9 +2,37 @@
 import requests
 import logging
 from typing import List, Dict
+from requests.adapters import HTTPAdapter, Retry
 
 logger = logging.getLogger(__name__)
 
+# 可选使用 orjson 加速 JSON 解析，未安装时回退到标准库
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def format_heat(hotwordnum) -> str:
+    """
+    格式化热度数值，一万及以上以"万"为单位显示
+    
+    Args:
+        hotwordnum: 原始热度值
+    
+    Returns:
+        格式化后的热度文本，无法解析时原样返回
+    """
+    text = str(hotwordnum).strip()
+    if not text.isdecimal():
+        return text
+    
+    heat = int(text)
+    if heat >= 10000:
+        return f"{heat/10000:.1f}万"
+    return str(heat)
+
 
 class WeiboFetcher:
     """微博热搜抓取器"""
@@ -18,6 +46,18 @@ class WeiboFetcher:
         """
         self.api_key = api_key
         self.api_url = "https://apis.tianapi.com/weibohot/index"
+        
+        # 复用连接池，并对服务端临时错误自动重试
+        self.session = requests.Session()
+        retry = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[500, 502, 503, 504],
+            allowed_methods=["GET"]
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         logger.info("微博热搜抓取器初始化成功")
     
     def fetch_hot_topics(self, limit: int = 50) -> List[Dict]:
@@ -35,15 +75,15 @@ class WeiboFetcher:
             
             # 发送请求
             params = {"key": self.api_key}
-            response = requests.get(self.api_url, params=params, timeout=10)
+            response = self.session.get(self.api_url, params=params, timeout=10)
             response.raise_for_status()
             
             # 解析响应
-            data = response.json()
+            data = orjson.loads(response.content) if ORJSON_AVAILABLE else response.json()
             
             if data.get("code") != 200:
                 error_msg = data.get("msg", "未知错误")
-                logger.error(f"API 返回错误: {error_msg}")
+                logger.error("API 返回错误: %s", error_msg)
                 return []
             
             # 获取热搜列表
@@ -52,49 +92,55 @@ class WeiboFetcher:
             # 限制数量
             hot_topics = hot_topics[:limit]
             
-            logger.info(f"成功获取 {len(hot_topics)} 个热搜话题")
+            # 热度只解析一次，供后续各格式化环节复用
+            for topic in hot_topics:
+                topic["heat_str"] = format_heat(topic.get("hotwordnum", "0"))
+            
+            logger.info("成功获取 %d 个热搜话题", len(hot_topics))
             
             return hot_topics
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"请求失败: {str(e)}")
+            logger.error("请求失败: %s", e)
             return []
         except Exception as e:
-            logger.error(f"抓取失败: {str(e)}")
+            logger.error("抓取失败: %s", e)
             return []
     
-    def format_topics(self, topics: List[Dict]) -> str:
+    def format_topics_lines(self, topics: List[Dict]) -> List[str]:
         """
-        格式化热搜话题为文本
+        格式化热搜话题为文本行
         
         Args:
             topics: 热搜列表
         
         Returns:
-            格式化后的文本
+            每个话题一行的文本列表
         """
-        if not topics:
-            return "暂无热搜数据"
-        
         lines = []
         for i, topic in enumerate(topics, 1):
             hottag = topic.get("hottag", "")
             hotword = topic.get("hotword", "")
-            hotwordnum = topic.get("hotwordnum", "0")
+            heat_str = topic.get("heat_str") or format_heat(topic.get("hotwordnum", "0"))
             
             # 格式化标签
             tag_str = f"[{hottag}]" if hottag else ""
             
-            # 格式化热度
-            try:
-                heat = int(hotwordnum)
-                if heat >= 10000:
-                    heat_str = f"{heat/10000:.1f}万"
-                else:
-                    heat_str = str(heat)
-            except:
-                heat_str = hotwordnum
-            
             lines.append(f"{i}. {tag_str} {hotword} (热度: {heat_str})")
         
-        return "\n".join(lines)
+        return lines
+    
+    def format_topics(self, topics: List[Dict]) -> str:
+        """
+        格式化热搜话题为文本
+        
+        Args:
+            topics: 热搜列表
+        
+        Returns:
+            格式化后的文本
+        """
+        if not topics:
+            return "暂无热搜数据"
+        
+        return "\n".join(self.format_topics_lines(topics))
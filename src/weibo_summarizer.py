@@ -1,84 +1,642 @@
 """微博热搜 DeepSeek 总结模块"""
+import asyncio
+import functools
+import hashlib
+import importlib.util
+import json
 import logging
-import os
-from typing import Optional
-from openai import OpenAI
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+from openai import APIConnectionError, APIError, APITimeoutError, AsyncOpenAI, InternalServerError, OpenAI, RateLimitError
+
+from summary_cache import SummaryCache
 
 logger = logging.getLogger(__name__)
 
+# 提示词固定前缀：要求在前、热搜列表在后，使每次请求的前缀完全一致以命中服务端前缀缓存
+_PROMPT_PREFIX = (
+    "请对下面的微博热搜话题进行智能总结和分析。\n"
+    "要求：用中文输出300-500字的简洁总结，概括热点趋势，突出前5-10个话题，分析背后的社会现象，如有明显主题（娱乐/科技/社会等）可分类说明。\n\n"
+    "热搜列表：\n"
+)
+
+# 分类总结提示词固定前缀
+_BUCKET_PROMPT_PREFIX = (
+    "请为下面每个分类的微博热搜话题分别用中文写100-200字的简洁总结，"
+    "以 JSON 对象返回，键为各分类标题（不含 ## 符号），值为对应总结。\n\n"
+)
+
+# 输出 token 上限，覆盖 300-500 字的总结并留有余量
+_MAX_TOKENS = 700
+
+# 单个热搜词的最大长度，避免异常长的词条拉长提示词
+_MAX_HOTWORD_LEN = 80
+
+# 可重试的临时错误（限流、超时、连接失败、服务端 5xx 过载）；认证失败、请求参数错误等不重试
+_TRANSIENT_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+# 重试等待时间范围（秒），在范围内随机指数退避
+_RETRY_MIN_WAIT = 1
+_RETRY_MAX_WAIT = 30
+
+# 分类总结时每个请求最多合并的分类数，过多时拆分为多个请求
+_MAX_BUCKETS_PER_REQUEST = 4
+
+# 进程内总结缓存（一级缓存，LRU + TTL），榜单未变化时跳过 API 调用
+_CACHE_MAXSIZE = 128
+_CACHE_TTL = 300  # 秒
+_summary_cache = OrderedDict()
+_summary_cache_lock = threading.Lock()
+
+# 持久化总结缓存（二级缓存）有效期（秒）
+_PERSISTENT_CACHE_TTL = 600
+
+
+def _retry_wait(attempt: int) -> float:
+    """
+    计算第 attempt 次失败后的随机指数退避等待时间
+    
+    Args:
+        attempt: 失败的尝试序号（从0开始）
+    
+    Returns:
+        等待秒数
+    """
+    return random.uniform(_RETRY_MIN_WAIT, min(_RETRY_MAX_WAIT, _RETRY_MIN_WAIT * 2 ** (attempt + 1)))
+
+
+def _unique_topics(topics: list) -> list:
+    """
+    去除空热搜词和重复热搜词，保留前 30 个参与总结的话题
+    
+    Args:
+        topics: 热搜列表
+    
+    Returns:
+        去重后的热搜列表
+    """
+    seen = set()
+    unique = []
+    for t in topics:
+        hotword = t.get("hotword")
+        if not hotword or hotword in seen:
+            continue
+        seen.add(hotword)
+        unique.append(t)
+        if len(unique) == 30:
+            break
+    return unique
+
+
+def _format_topics(topics: list) -> str:
+    """
+    将热搜话题格式化为提示词中的列表文本
+    
+    Args:
+        topics: 热搜列表
+    
+    Returns:
+        每个话题一行的文本
+    """
+    return "\n".join(
+        f"{i}. [{t.get('hottag', '')}] {t.get('hotword', '')[:_MAX_HOTWORD_LEN]} (热度: {t.get('hotwordnum', '0')})"
+        for i, t in enumerate(_unique_topics(topics), 1)
+    )
+
+
+def _cache_key(topics: list, model_name: str) -> str:
+    """
+    根据参与总结的热搜话题、模型和提示词生成缓存键
+    
+    提示词或模型变化后键随之变化，旧版本的总结不会再被命中。
+    
+    Args:
+        topics: 热搜列表
+        model_name: 模型名称
+    
+    Returns:
+        缓存键
+    """
+    canonical = f"{model_name}\x1e{_PROMPT_PREFIX}\x1e{_MAX_TOKENS}\x1e" + "|".join(
+        f"{t.get('hottag', '')}\x1f{t.get('hotword', '')}\x1f{t.get('hotwordnum', '0')}"
+        for t in _unique_topics(topics)
+    )
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[str]:
+    """读取未过期的缓存总结"""
+    with _summary_cache_lock:
+        entry = _summary_cache.get(key)
+        if entry is None:
+            return None
+        
+        stored_at, summary = entry
+        if time.monotonic() - stored_at > _CACHE_TTL:
+            del _summary_cache[key]
+            return None
+        
+        _summary_cache.move_to_end(key)
+        return summary
+
+
+def _cache_put(key: str, summary: str):
+    """写入缓存总结，超出容量时淘汰最久未使用的条目"""
+    with _summary_cache_lock:
+        _summary_cache[key] = (time.monotonic(), summary)
+        _summary_cache.move_to_end(key)
+        while len(_summary_cache) > _CACHE_MAXSIZE:
+            _summary_cache.popitem(last=False)
+
 
 class WeiboSummarizer:
-    """微博热搜总结器"""
+    """
+    微博热搜总结器
+    
+    每个实例持有独立的连接池，热路径中请通过 get_summarizer() 获取共享实例，
+    不要重复构造。
+    """
+    
+    __slots__ = (
+        "api_key", "base_url", "client", "_aclient", "_aclient_loop", "model_name", "cache",
+        "max_concurrency", "rpm", "_request_times", "max_retries"
+    )
     
-    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None):
+    def __init__(self, api_key: str, base_url: str = "https://api.deepseek.com",
+                 max_concurrency: int = 8, rpm: int = 60, prewarm: bool = True,
+                 cache=None):
         """
         初始化微博热搜总结器
         
         Args:
             api_key: DeepSeek API密钥
             base_url: API基础URL
+            max_concurrency: 并发总结时的最大并发请求数
+            rpm: 每分钟最多发起的请求数
+            prewarm: 是否在后台预热到 API 的连接
+            cache: 持久化总结缓存（二级缓存），需提供 get(key) 与 set(key, summary) 方法，
+                默认使用有效期 10 分钟的磁盘缓存 SummaryCache，进程重启后仍然有效
         """
-        self.api_key = api_key or os.getenv("DEEPSEEK_API_KEY")
-        if not self.api_key:
+        if not api_key:
             raise ValueError("DeepSeek API密钥未设置")
         
-        self.base_url = base_url or os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+        self.api_key = api_key
+        self.base_url = base_url
         
+        # 重试由本类按错误类型控制，关闭 SDK 内置重试避免重复
         self.client = OpenAI(
             api_key=self.api_key,
-            base_url=self.base_url
+            base_url=self.base_url,
+            max_retries=0
         )
         
+        # 异步客户端绑定事件循环，首次在某个事件循环中使用时才创建（见 aclient）
+        self._aclient = None
+        self._aclient_loop = None
+        
         self.model_name = "deepseek-chat"
+        self.cache = cache if cache is not None else SummaryCache(ttl=_PERSISTENT_CACHE_TTL)
+        
+        # 并发与速率限制
+        self.max_concurrency = max_concurrency
+        self.rpm = rpm
+        self._request_times = deque()
+        
+        # 重试配置
+        self.max_retries = 4
+        
+        # 后台预热连接，首次总结时可直接复用已建立的长连接
+        if prewarm:
+            threading.Thread(target=self.warmup, daemon=True).start()
+        
         logger.info("微博热搜总结器初始化成功")
     
-    def summarize(self, topics: list) -> Optional[str]:
+    def warmup(self):
+        """预先建立到 API 的连接（DNS/TCP/TLS），失败时忽略"""
+        try:
+            self.client.models.list()
+            logger.debug("DeepSeek 连接预热完成")
+        except Exception as e:
+            logger.debug("DeepSeek 连接预热失败: %s", e)
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.aclose()
+    
+    @property
+    def aclient(self) -> AsyncOpenAI:
+        """
+        当前事件循环专用的异步客户端，用于并发总结多组话题
+        
+        连接池保持长连接，安装 h2 时启用 HTTP/2 多路复用。池中的连接绑定创建时的事件循环，
+        因此换到新的事件循环（如多次调用 asyncio.run()）时会重新创建客户端。
+        必须在运行中的事件循环内访问。
+        """
+        loop = asyncio.get_running_loop()
+        if self._aclient is None or self._aclient_loop is not loop:
+            self._aclient = AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=httpx.AsyncClient(
+                    http2=importlib.util.find_spec("h2") is not None,
+                    timeout=httpx.Timeout(60.0, connect=5.0),
+                    limits=httpx.Limits(max_keepalive_connections=20, max_connections=100, keepalive_expiry=30.0)
+                ),
+                max_retries=0
+            )
+            self._aclient_loop = loop
+        return self._aclient
+    
+    async def aclose(self):
+        """关闭当前事件循环的异步客户端连接池"""
+        if self._aclient is None:
+            return
+        
+        # 其他（可能已关闭的）事件循环创建的客户端无法在此关闭，直接丢弃
+        if self._aclient_loop is asyncio.get_running_loop():
+            await self._aclient.close()
+        self._aclient = None
+        self._aclient_loop = None
+    
+    def _with_retry(self, func, *args, **kwargs):
+        """
+        调用 API，仅对临时错误按随机指数退避重试
+        
+        Args:
+            func: 要调用的 SDK 方法
+            *args: 传给 func 的位置参数
+            **kwargs: 传给 func 的关键字参数
+        
+        Returns:
+            func 的返回值
+        """
+        for attempt in range(self.max_retries):
+            try:
+                return func(*args, **kwargs)
+            except _TRANSIENT_ERRORS as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                wait_time = _retry_wait(attempt)
+                logger.warning("第 %d 次请求失败: %s，等待 %.1f 秒后重试", attempt + 1, e, wait_time)
+                time.sleep(wait_time)
+    
+    async def _awith_retry(self, func, *args, **kwargs):
+        """
+        异步调用 API，每次尝试前遵守速率限制，仅对临时错误按随机指数退避重试
+        
+        Args:
+            func: 要调用的异步 SDK 方法
+            *args: 传给 func 的位置参数
+            **kwargs: 传给 func 的关键字参数
+        
+        Returns:
+            func 的返回值
+        """
+        for attempt in range(self.max_retries):
+            await self._throttle()
+            try:
+                return await func(*args, **kwargs)
+            except _TRANSIENT_ERRORS as e:
+                if attempt == self.max_retries - 1:
+                    raise
+                wait_time = _retry_wait(attempt)
+                logger.warning("第 %d 次请求失败: %s，等待 %.1f 秒后重试", attempt + 1, e, wait_time)
+                await asyncio.sleep(wait_time)
+    
+    def _build_prompt(self, topics: list) -> str:
+        """
+        构建总结提示词
+        
+        Args:
+            topics: 热搜列表
+        
+        Returns:
+            提示词文本
+        """
+        return _PROMPT_PREFIX + _format_topics(topics)
+    
+    def summarize(self, topics: list, use_cache: bool = True) -> Optional[str]:
         """
         总结微博热搜话题
         
         Args:
             topics: 热搜列表
+            use_cache: 是否使用总结缓存（进程内缓存及持久化缓存）
         
         Returns:
             总结文本
         """
         try:
-            logger.info(f"开始总结 {len(topics)} 个热搜话题")
+            key = _cache_key(topics, self.model_name) if use_cache else None
+            if key is not None:
+                summary = _cache_get(key)
+                if summary is not None:
+                    logger.info("命中总结缓存，跳过 API 调用")
+                    return summary
+                
+                # 不回填一级缓存，否则总结的实际有效期会超过持久化缓存的 TTL
+                summary = self.cache.get(key)
+                if summary is not None:
+                    logger.info("命中持久化总结缓存，跳过 API 调用")
+                    return summary
             
-            # 构建内容
-            content = "\n".join([
-                f"{i+1}. [{t.get('hottag', '')}] {t.get('hotword', '')} (热度: {t.get('hotwordnum', '0')})"
-                for i, t in enumerate(topics[:30])
-            ])
-            
-            # 构建提示词
-            prompt = f"""请对以下微博热搜话题进行智能总结和分析：
-
-{content}
-
-要求：
-1. 用简洁的语言概括当前的热点话题和趋势
-2. 突出最受关注的热搜内容（前5-10个）
-3. 分析这些热搜背后反映的社会现象或热点事件
-4. 如果有明显的主题分类（如娱乐、科技、社会等），可以分类说明
-5. 总结字数控制在 300-500 字
-6. 使用中文输出
-
-请开始总结："""
+            logger.info("开始总结 %d 个热搜话题", len(topics))
             
-            # 调用 API
-            response = self.client.chat.completions.create(
+            # 调用 API，仅对临时错误重试
+            response = self._with_retry(
+                self.client.chat.completions.create,
                 model=self.model_name,
-                messages=[{"role": "user", "content": prompt}],
+                messages=[{"role": "user", "content": self._build_prompt(topics)}],
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=_MAX_TOKENS
             )
             
-            summary = response.choices[0].message.content.strip()
-            logger.info(f"总结完成，长度: {len(summary)} 字符")
+            summary = (response.choices[0].message.content or "").strip()
+            if not summary:
+                logger.warning("总结内容为空")
+                return None
+            
+            logger.info("总结完成，长度: %d 字符", len(summary))
+            
+            if key is not None:
+                _cache_put(key, summary)
+                self.cache.set(key, summary)
             
             return summary
             
-        except Exception as e:
-            logger.error(f"总结失败: {str(e)}")
+        except APIError as e:
+            logger.error("总结失败: %s", e)
             return None
+    
+    def summarize_buckets(self, buckets: Dict[str, list]) -> Dict[str, str]:
+        """
+        将多个分类的热搜合并到一次请求中分别总结
+        
+        Args:
+            buckets: 分类名到热搜列表的映射，如 {"娱乐": [...], "科技": [...]}
+        
+        Returns:
+            分类名到总结文本的映射，总结失败的分类不包含在内
+        """
+        names = list(buckets)
+        results = {}
+        
+        # 分类过多时拆分为若干请求，避免单个提示词过长
+        for start in range(0, len(names), _MAX_BUCKETS_PER_REQUEST):
+            chunk = names[start:start + _MAX_BUCKETS_PER_REQUEST]
+            sections = "\n\n".join(f"## {name}\n{_format_topics(buckets[name])}" for name in chunk)
+            prompt = _BUCKET_PROMPT_PREFIX + sections
+            
+            try:
+                logger.info("开始分类总结: %s", "、".join(chunk))
+                response = self._with_retry(
+                    self.client.chat.completions.create,
+                    model=self.model_name,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.7,
+                    max_tokens=_MAX_TOKENS * len(chunk),
+                    response_format={"type": "json_object"}
+                )
+                content = response.choices[0].message.content
+                if not content:
+                    raise ValueError("返回内容为空")
+                parsed = json.loads(content)
+                if not isinstance(parsed, dict):
+                    raise ValueError("返回内容不是 JSON 对象")
+            except (APIError, ValueError) as e:
+                logger.error("分类总结失败（%s）: %s", "、".join(chunk), e)
+                continue
+            
+            for name in chunk:
+                summary = parsed.get(name)
+                if isinstance(summary, str) and summary.strip():
+                    results[name] = summary.strip()
+                else:
+                    logger.warning("分类 %s 未返回总结", name)
+        
+        return results
+    
+    def submit_batch(self, groups: List[list]) -> str:
+        """
+        以 Batch API 提交多组热搜总结任务，适用于无需即时返回的定时任务
+        
+        需要 API 服务端支持 OpenAI 兼容的 files/batches 接口。
+        
+        Args:
+            groups: 热搜列表的列表
+        
+        Returns:
+            批任务 ID，用于 poll_batch() 查询结果
+        """
+        lines = [
+            json.dumps({
+                "custom_id": f"group-{i}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.model_name,
+                    "messages": [{"role": "user", "content": self._build_prompt(group)}],
+                    "temperature": 0.7,
+                    "max_tokens": _MAX_TOKENS
+                }
+            }, ensure_ascii=False)
+            for i, group in enumerate(groups)
+        ]
+        
+        batch_file = self._with_retry(
+            self.client.files.create,
+            file=("weibo_batch.jsonl", "\n".join(lines).encode("utf-8")),
+            purpose="batch"
+        )
+        batch = self._with_retry(
+            self.client.batches.create,
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info("已提交批量总结任务 %s，共 %d 组", batch.id, len(groups))
+        return batch.id
+    
+    def poll_batch(self, batch_id: str) -> Optional[List[Optional[str]]]:
+        """
+        查询批量总结任务结果
+        
+        Args:
+            batch_id: submit_batch() 返回的批任务 ID
+        
+        Returns:
+            与提交顺序一一对应的总结文本（失败的组为 None），任务未完成时返回 None
+        """
+        batch = self._with_retry(self.client.batches.retrieve, batch_id)
+        if batch.status != "completed":
+            if batch.status in ("failed", "expired", "cancelled"):
+                logger.error("批量总结任务 %s 状态异常: %s", batch_id, batch.status)
+            else:
+                logger.info("批量总结任务 %s 尚未完成: %s", batch_id, batch.status)
+            return None
+        
+        results = self._read_batch_file(batch.output_file_id)
+        errors = self._read_batch_file(batch.error_file_id)
+        
+        # request_counts 在部分兼容服务端中缺失，结果数量同时参考已解析的 custom_id
+        counts = getattr(batch, "request_counts", None)
+        total = max(getattr(counts, "total", 0) or 0, max(results.keys() | errors.keys(), default=-1) + 1)
+        
+        summaries = [None] * total
+        for index, record in results.items():
+            try:
+                summaries[index] = record["response"]["body"]["choices"][0]["message"]["content"].strip()
+            except (KeyError, IndexError, TypeError, AttributeError):
+                logger.error("批量总结第 %d 组失败: %s", index + 1, record.get("error"))
+        
+        for index, record in errors.items():
+            logger.error("批量总结第 %d 组失败: %s", index + 1, record.get("error") or record.get("response"))
+        
+        logger.info("批量总结任务 %s 完成，成功 %d/%d 组", batch_id, sum(s is not None for s in summaries), len(summaries))
+        return summaries
+    
+    def _read_batch_file(self, file_id: Optional[str]) -> Dict[int, dict]:
+        """
+        下载并解析批任务的输出或错误文件，跳过无法解析的行
+        
+        Args:
+            file_id: 文件 ID，为空时返回空结果
+        
+        Returns:
+            组序号到结果记录的映射
+        """
+        records = {}
+        if not file_id:
+            return records
+        
+        content = self._with_retry(self.client.files.content, file_id).text
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                index = int(record["custom_id"].rsplit("-", 1)[1])
+            except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+                logger.warning("跳过无法解析的批量结果行: %s（%s）", line[:200], e)
+                continue
+            if index < 0:
+                logger.warning("跳过无效的批量结果序号: %s", record["custom_id"])
+                continue
+            records[index] = record
+        return records
+    
+    async def summarize_stream(self, topics: list) -> AsyncIterator[str]:
+        """
+        流式总结微博热搜话题，边生成边返回文本片段
+        
+        Args:
+            topics: 热搜列表
+        
+        Yields:
+            总结文本片段
+        """
+        logger.info("开始流式总结 %d 个热搜话题", len(topics))
+        
+        # 仅在建立流之前重试，已输出的片段无法撤回
+        stream = await self._awith_retry(
+            self.aclient.chat.completions.create,
+            model=self.model_name,
+            messages=[{"role": "user", "content": self._build_prompt(topics)}],
+            temperature=0.7,
+            max_tokens=_MAX_TOKENS,
+            stream=True
+        )
+        # 调用方提前停止迭代时也要关闭响应，及时把连接归还连接池
+        async with stream:
+            async for chunk in stream:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content or ""
+    
+    async def _throttle(self):
+        """等待直到最近一分钟内的请求数低于 rpm 限制"""
+        while True:
+            now = time.monotonic()
+            while self._request_times and now - self._request_times[0] >= 60:
+                self._request_times.popleft()
+            
+            if len(self._request_times) < self.rpm:
+                self._request_times.append(now)
+                return
+            
+            await asyncio.sleep(60 - (now - self._request_times[0]))
+    
+    async def _summarize_one(self, topics: list, semaphore: asyncio.Semaphore) -> str:
+        """
+        异步总结一组热搜话题，遇到临时错误时按随机指数退避重试
+        
+        Args:
+            topics: 热搜列表
+            semaphore: 限制并发请求数的信号量
+        
+        Returns:
+            总结文本
+        """
+        async with semaphore:
+            response = await self._awith_retry(
+                self.aclient.chat.completions.create,
+                model=self.model_name,
+                messages=[{"role": "user", "content": self._build_prompt(topics)}],
+                temperature=0.7,
+                max_tokens=_MAX_TOKENS
+            )
+        
+        summary = (response.choices[0].message.content or "").strip()
+        if not summary:
+            raise ValueError("总结内容为空")
+        return summary
+    
+    async def summarize_many(self, groups: List[list]) -> List[Optional[str]]:
+        """
+        并发总结多组热搜话题（如按分类拆分的榜单）
+        
+        Args:
+            groups: 热搜列表的列表
+        
+        Returns:
+            与 groups 一一对应的总结文本，失败的组为 None
+        """
+        logger.info("开始并发总结 %d 组热搜话题", len(groups))
+        
+        # 信号量绑定当前事件循环，因此每次调用单独创建
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(
+            *(self._summarize_one(group, semaphore) for group in groups),
+            return_exceptions=True
+        )
+        
+        summaries = []
+        for i, result in enumerate(results, 1):
+            if isinstance(result, BaseException):
+                logger.error("第 %d 组总结失败: %s", i, result)
+                summaries.append(None)
+            else:
+                summaries.append(result)
+        
+        logger.info("并发总结完成，成功 %d/%d 组", sum(s is not None for s in summaries), len(groups))
+        return summaries
+
+
+@functools.lru_cache(maxsize=1)
+def get_summarizer(api_key: str, base_url: str = "https://api.deepseek.com") -> WeiboSummarizer:
+    """
+    获取进程内共享的微博热搜总结器，相同配置只构造一次
+    
+    Args:
+        api_key: DeepSeek API密钥
+        base_url: API基础URL
+    
+    Returns:
+        WeiboSummarizer 实例
+    """
+    return WeiboSummarizer(api_key, base_url)